@@ -2,32 +2,208 @@ import os
 import sys
 from datetime import datetime
 import streamlit as st
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
-import statsmodels.api as sm
 
 # --- CONFIGURATION ---
-DATA_FILE_PATH = "data/bls_data.csv"
+DATA_FILE_PATH = "data/bls_data.parquet"
+LEGACY_CSV_PATH = "data/bls_data.csv"
 st.set_page_config(layout="wide", page_title="US Labor & Economic Dashboard (BLS Data)")
 
-@st.cache_data
+# Raw series and the derived columns precomputed by collect_data.py
+OUTPUT_COLUMN = 'Output_Per_Hour_NF'
+CPI_COLUMN = 'CPI_U_Ex_Food_Energy_U'
+CPI_YOY_COLUMN = 'CPI_YoY_Change'
+
+# cache_resource hands every rerun the same in-memory frame instead of unpickling a copy; the
+# dashboard only ever slices and reads it, so the shared frame must never be mutated in place
+@st.cache_resource
 def load_data(path):
-    """Loads the processed data from CSV, caches it for fast dashboard loading."""
+    """Loads the processed data from Parquet, caches it for fast dashboard loading.
+
+    Returns the frame with its first and last dates and the last-updated label, so reruns reuse them.
+    """
     try:
-        df = pd.read_csv(path, parse_dates=['Date'])
+        if os.path.exists(path):
+            # Date is stored as datetime64, so no date parsing is needed
+            df = pd.read_parquet(path, engine="pyarrow")
+        else:
+            # Fall back to the legacy CSV until collect_data.py has migrated it
+            df = pd.read_csv(LEGACY_CSV_PATH, parse_dates=['Date'])
         # Set date column is the index
         df.set_index('Date', inplace=True)
-        return df
+        # The date-range filter binary-searches the index, so it must be sorted
+        if not df.index.is_monotonic_increasing:
+            df.sort_index(inplace=True)
+        # Files written before collect_data.py stored the derived columns get them once here
+        if CPI_YOY_COLUMN not in df.columns and CPI_COLUMN in df.columns:
+            df[CPI_YOY_COLUMN] = df[CPI_COLUMN].pct_change(periods=12, fill_method=None) * 100
+        if df.empty:
+            return df, None, None, None
+        # The index is sorted, so the slider bounds are its endpoints
+        first_date = df.index[0].to_pydatetime()
+        last_date = df.index[-1].to_pydatetime()
+        return df, first_date, last_date, last_date.strftime('%B %Y')
     except FileNotFoundError:
         st.error(f"Data file not found at {path}. Please run the data collection script first.")
         # Log this error explicitly too
         with open('/content/app_debug_logs.txt', 'a') as f:
             f.write(f'[DEBUG APP] FileNotFoundError for {path} at {datetime.now()}\n')
-        return pd.DataFrame()
+        return pd.DataFrame(), None, None, None
+
+# --- CHART BUILDERS ---
+# Streamlit reruns the whole script on every slider change. Each builder is cached on the
+# (start, end) date range; the leading-underscore frame argument (already filtered to that
+# range) is skipped by Streamlit's hasher, so revisiting a window reuses the built figure.
+
+def line_fig(df, column, title, y_title):
+    """Single-series WebGL line chart over the Date index, built from raw NumPy arrays."""
+    fig = go.Figure(go.Scattergl(x=df.index.values, y=df[column].values, mode='lines'))
+    fig.update_layout(title=title, height=400, xaxis_title='Date', yaxis_title=y_title)
+    return fig
+
+@st.cache_data(max_entries=32)
+def build_unemp_fig(_df_filtered, start, end):
+    return line_fig(_df_filtered, 'Unemployment_Rate_SA', 'Unemployment Rate Over Time', 'Rate (%)')
+
+@st.cache_data(max_entries=32)
+def build_nonfarm_fig(_df_filtered, start, end):
+    return line_fig(_df_filtered, 'Total_Nonfarm_Employment_SA', 'Total Nonfarm Employment', 'Employment (Thousands)')
+
+@st.cache_data(max_entries=32)
+def build_output_fig(_df_filtered, start, end):
+    # Drop missing (non-quarter) rows once; the Date index becomes the x-axis
+    out_df = _df_filtered[[OUTPUT_COLUMN]].dropna()
+
+    fig_output = go.Figure(go.Scattergl(
+        x=out_df.index.values,
+        y=out_df[OUTPUT_COLUMN].values,
+        mode='lines+markers',
+        line=dict(width=3, color='firebrick'),
+        marker=dict(size=8, symbol='circle', line=dict(width=1, color='DarkSlateGrey')),
+        connectgaps=False
+    ))
+
+    fig_output.update_layout(
+        title='Output Per Hour Index (Quarterly)',
+        height=400,
+        xaxis_title='Date',
+        yaxis_title='Index Value'
+    )
+    return fig_output
+
+@st.cache_data(max_entries=32)
+def build_hours_fig(_df_filtered, start, end):
+    return line_fig(_df_filtered, 'Avg_Weekly_Hours_Private_SA', 'Average Weekly Hours', 'Avg_Weekly_Hours_Private_SA')
+
+@st.cache_data(max_entries=32)
+def build_cpi_fig(_df_filtered, start, end):
+    # Year-over-Year (YoY) change is precomputed over the full history; drop the first year and unreleased months
+    cpi_df = _df_filtered[[CPI_YOY_COLUMN]].dropna()
+    yoy = cpi_df[CPI_YOY_COLUMN].values
+
+    # Create the bar chart for CPI, coloring each bar by its own value
+    fig_cpi = go.Figure(go.Bar(
+        x=cpi_df.index.values,
+        y=yoy,
+        marker=dict(color=yoy, colorscale='RdYlGn_r', colorbar=dict(title='Year-over-Year Change (%)'))
+    ))
+
+    fig_cpi.update_layout(
+        title='Inflation: CPI-U Less Food and Energy (YoY % Change)',
+        height=400,
+        xaxis_title='Date',
+        yaxis_title='Year-over-Year Change (%)'
+    )
+
+    fig_cpi.add_hline(y=0, line_dash="solid", line_color="black")
+    return fig_cpi
+
+@st.cache_data(max_entries=32)
+def build_trade_fig(_df_filtered, start, end):
+    # One trace per series on the same axis, so no long-format reshape is needed
+    x = _df_filtered.index.values
+    fig_trade = go.Figure([
+        go.Scattergl(x=x, y=_df_filtered[column].values, mode='lines', name=column)
+        for column in ['Exports_All_Commodities_U', 'Imports_All_Commodities_U']
+    ])
+
+    fig_trade.update_layout(
+        title='Trade: Imports and Exports for All Commodities',
+        height=400,
+        xaxis_title='Date',
+        yaxis_title='Value ($ Billions?)',
+        legend_title_text='Series'
+    )
+    return fig_trade
+
+def simple_ols(x, y):
+    """Closed-form OLS of y on x with an intercept. Returns alpha, beta, R-squared and the slope's p-value."""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+
+    xm = x.mean()
+    ym = y.mean()
+    sxx = ((x - xm) ** 2).sum()
+    sxy = ((x - xm) * (y - ym)).sum()
+
+    beta = sxy / sxx
+    alpha = ym - beta * xm
+
+    yhat = alpha + beta * x
+    ss_res = ((y - yhat) ** 2).sum()
+    ss_tot = ((y - ym) ** 2).sum()
+    r2 = 1 - ss_res / ss_tot
+
+    # scipy.stats is only needed for the slope's p-value, so import it here rather than on cold start
+    from scipy import stats
+
+    # Two-sided t-test on the slope with n - 2 degrees of freedom
+    se = np.sqrt(ss_res / (n - 2) / sxx)
+    pvalue = 2 * stats.t.sf(abs(beta / se), n - 2)
+
+    return {'alpha': alpha, 'beta': beta, 'rsquared': r2, 'pvalue': pvalue}
+
+@st.cache_data(max_entries=32)
+def run_ols(_ols_df, start, end):
+    """Fits Unemployment Rate on Nonfarm Employment; returns the key statistics and the scatter figure."""
+    # Define Variables
+    Y = _ols_df['Unemployment_Rate_SA']
+    X = _ols_df['Total_Nonfarm_Employment_SA']
+
+    # Run OLS Regression
+    results = simple_ols(X, Y)
+
+    # Create a scatter plot with the OLS line
+    fig_ols = go.Figure(go.Scattergl(x=X.values, y=Y.values, mode='markers', showlegend=False))
+    fig_ols.update_layout(
+        title='OLS Regression: Unemployment vs. Nonfarm Employment',
+        height=500,
+        xaxis_title='Total_Nonfarm_Employment_SA',
+        yaxis_title='Unemployment_Rate_SA'
+    )
+
+    # A straight line only needs its two endpoints
+    x_line = np.array([X.min(), X.max()])
+    fig_ols.add_trace(go.Scatter(
+        x=x_line,
+        y=results['alpha'] + results['beta'] * x_line,
+        mode='lines',
+        name='OLS trendline',
+        showlegend=False
+    ))
+
+    stats_out = {
+        'rsquared': results['rsquared'],
+        'pvalue': results['pvalue'],
+        'coef': results['beta'],
+    }
+    return stats_out, fig_ols
 
 # Load the data
-df = load_data(DATA_FILE_PATH)
+df, full_min_datetime, full_max_datetime, last_date_label = load_data(DATA_FILE_PATH)
 
 if not df.empty:
 
@@ -37,9 +213,6 @@ if not df.empty:
 
         # 1. Date Range Slider (KEPT)
         st.subheader("Select Date Range")
-        full_min_datetime = df.index.min().to_pydatetime()
-        full_max_datetime = df.index.max().to_pydatetime()
-
         start_date_slider, end_date_slider = st.slider(
             'Filter data between:',
             min_value=full_min_datetime,
@@ -50,14 +223,16 @@ if not df.empty:
 
         start_timestamp = pd.to_datetime(start_date_slider)
         end_timestamp = pd.to_datetime(end_date_slider)
-        df_filtered = df.loc[start_timestamp:end_timestamp]
+        # Binary-search the sorted index for positions and slice, skipping label-based .loc dispatch
+        lo = df.index.searchsorted(start_timestamp, side='left')
+        hi = df.index.searchsorted(end_timestamp, side='right')
+        df_filtered = df.iloc[lo:hi]
 
         st.markdown("---")
 
         # 2. Last Date Updated (NEW)
         st.subheader("Data Status")
-        last_date = df.index[-1].strftime('%B %Y')
-        st.info(f" **Last Date Updated:** {last_date}")
+        st.info(f" **Last Date Updated:** {last_date_label}")
 
         st.markdown("---")
 
@@ -90,24 +265,12 @@ if not df.empty:
 
     with col1:
         st.subheader("Unemployment Rate (SA)")
-        fig_unemp = px.line(
-            df_filtered,
-            y='Unemployment_Rate_SA',
-            title='Unemployment Rate Over Time',
-            labels={'Unemployment_Rate_SA': 'Rate (%)'},
-            height=400
-        )
+        fig_unemp = build_unemp_fig(df_filtered, start_timestamp, end_timestamp)
         st.plotly_chart(fig_unemp, use_container_width=True)
 
     with col2:
         st.subheader("Total Nonfarm Employment (SA)")
-        fig_nonfarm = px.line(
-            df_filtered,
-            y='Total_Nonfarm_Employment_SA',
-            title='Total Nonfarm Employment',
-            labels={'Total_Nonfarm_Employment_SA': 'Employment (Thousands)'},
-            height=400
-        )
+        fig_nonfarm = build_nonfarm_fig(df_filtered, start_timestamp, end_timestamp)
         st.plotly_chart(fig_nonfarm, use_container_width=True)
 
     st.markdown("---")
@@ -121,30 +284,8 @@ if not df.empty:
     with col3:
         st.subheader("Output Per Hour - Non-farm Business")
 
-        OUTPUT_COLUMN = 'Output_Per_Hour_NF'
         if OUTPUT_COLUMN in df_filtered.columns:
-
-            fig_output = px.line(
-                df_filtered.dropna(subset=[OUTPUT_COLUMN]), # Drop missing rows
-                x=df_filtered.dropna(subset=[OUTPUT_COLUMN]).index,
-                y=OUTPUT_COLUMN,
-                title='Output Per Hour Index (Quarterly)',
-                height=400,
-                labels={'Output_Per_Hour_NF': 'Index Value'}
-            )
-
-            fig_output.update_traces(
-                mode='lines+markers',
-                line=dict(width=3, color='firebrick'),
-                marker=dict(size=8, symbol='circle', line=dict(width=1, color='DarkSlateGrey')),
-                connectgaps=False
-            )
-
-            fig_output.update_layout(
-                xaxis_title='Date',
-                yaxis_title='Index Value'
-            )
-
+            fig_output = build_output_fig(df_filtered, start_timestamp, end_timestamp)
             st.plotly_chart(fig_output, use_container_width=True)
             st.info(" **Note:** This series is released **quarterly**, resulting in only four points per year.")
 
@@ -153,12 +294,7 @@ if not df.empty:
 
     with col4:
         st.subheader("Total Private Average Weekly Hours")
-        fig_hours = px.line(
-            df_filtered,
-            y='Avg_Weekly_Hours_Private_SA',
-            title='Average Weekly Hours',
-            height=400
-        )
+        fig_hours = build_hours_fig(df_filtered, start_timestamp, end_timestamp)
         st.plotly_chart(fig_hours, use_container_width=True)
 
     st.markdown("---")
@@ -170,55 +306,17 @@ if not df.empty:
 
     st.subheader("CPI-U Less Food and Energy (Unadjusted)")
 
-    CPI_COLUMN = 'CPI_U_Ex_Food_Energy_U'
-
-    if CPI_COLUMN in df_filtered.columns:
-        # Calculate Year-over-Year (YoY) percentage change
-        df_filtered_cpi = df_filtered.copy()
-        df_filtered_cpi['YoY_Change'] = df_filtered_cpi[CPI_COLUMN].pct_change(periods=12) * 100
-
-        # Create the bar chart for CPI
-        fig_cpi = px.bar(
-            df_filtered_cpi.dropna(subset=['YoY_Change']).reset_index(), # Drop initial from pct_change
-            x='Date',
-            y='YoY_Change',
-            title='Inflation: CPI-U Less Food and Energy (YoY % Change)',
-            labels={'YoY_Change': 'Year-over-Year Change (%)'},
-            height=400,
-            color='YoY_Change',
-            color_continuous_scale=px.colors.diverging.RdYlGn_r
-        )
-
-        fig_cpi.add_hline(y=0, line_dash="solid", line_color="black")
-
+    if CPI_YOY_COLUMN in df_filtered.columns:
+        fig_cpi = build_cpi_fig(df_filtered, start_timestamp, end_timestamp)
         st.plotly_chart(fig_cpi, use_container_width=True)
 
     else:
-        st.warning(f"Data series '{CPI_COLUMN}' not found in the CSV. Cannot display inflation chart.")
+        st.warning(f"Data series '{CPI_COLUMN}' not found in the data. Cannot display inflation chart.")
 
 
     st.subheader("Imports vs. Exports (All Commodities)")
 
-    df_trade = df_filtered.copy()
-    df_trade['Trade_Balance'] = df_trade['Exports_All_Commodities_U'] - df_trade['Imports_All_Commodities_U']
-
-    # Combine the data for Plotly (Exports and Imports on the same axis)
-    df_trade_melt = df_trade[['Exports_All_Commodities_U', 'Imports_All_Commodities_U']].reset_index().melt(
-        id_vars='Date',
-        var_name='Series',
-        value_name='Value'
-    )
-
-    fig_trade = px.line(
-        df_trade_melt,
-        x='Date',
-        y='Value',
-        color='Series',
-        title='Trade: Imports and Exports for All Commodities',
-        labels={'Value': 'Value ($ Billions?)'},
-        height=400
-    )
-
+    fig_trade = build_trade_fig(df_filtered, start_timestamp, end_timestamp)
     st.plotly_chart(fig_trade, use_container_width=True)
 
 
@@ -237,32 +335,16 @@ if not df.empty:
 
     if len(ols_df) > 5:
         try:
-            # Define Variables
-            Y = ols_df['Unemployment_Rate_SA']
-            X = ols_df['Total_Nonfarm_Employment_SA']
-            X = sm.add_constant(X) # Add the intercept term
-
-            # Run OLS Regression
-            model = sm.OLS(Y, X)
-            results = model.fit()
+            stats, fig_ols = run_ols(ols_df, start_timestamp, end_timestamp)
 
             # Display key results
             col_ols1, col_ols2 = st.columns(2)
             with col_ols1:
-                st.info(f"R-squared: **{results.rsquared:.4f}**")
-                st.info(f"P-value (Nonfarm Employment): **{results.pvalues[1]:.4f}**")
-                st.info(f"Coefficient (Employment): **{results.params[1]:.4e}**") # Scientific notation for small coef
+                st.info(f"R-squared: **{stats['rsquared']:.4f}**")
+                st.info(f"P-value (Nonfarm Employment): **{stats['pvalue']:.4f}**")
+                st.info(f"Coefficient (Employment): **{stats['coef']:.4e}**") # Scientific notation for small coef
 
             with col_ols2:
-                # Create a scatter plot with the OLS line
-                fig_ols = px.scatter(
-                    ols_df,
-                    x='Total_Nonfarm_Employment_SA',
-                    y='Unemployment_Rate_SA',
-                    title='OLS Regression: Unemployment vs. Nonfarm Employment',
-                    trendline="ols", # Automatically adds the OLS line
-                    height=500
-                )
                 st.plotly_chart(fig_ols, use_container_width=True)
 
         except Exception as e:
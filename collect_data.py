@@ -1,8 +1,15 @@
+import hashlib
+import orjson
 import requests
+import numpy as np
 import pandas as pd
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import MappingProxyType
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # --- Configuration ---
 BLS_API_KEY = os.getenv('BLS_API_KEY')
@@ -12,7 +19,30 @@ if not BLS_API_KEY:
     
 BLS_API_URL = "https://api.bls.gov/publicAPI/v2/timeseries/data/"
 
-SERIES_MAP = {
+# BLS v2 accepts up to 50 series and 20 years per request, so the usual fetch is one POST; only
+# ranges past those limits are split, and the pieces are sent in parallel (each is one query against the daily limit)
+SERIES_PER_REQUEST = 50
+MAX_YEARS_PER_REQUEST = 20
+MAX_WORKERS = 4
+
+# Successful API responses are kept on disk briefly, so reruns with the same parameters skip the network
+CACHE_DIR = ".cache/bls"
+CACHE_TTL_SECONDS = 6 * 60 * 60
+
+# One pooled session reuses the TCP+TLS connection across every request in the run. Transient
+# rate-limit and server errors are retried with backoff; the BLS POST is a read, so retrying it is safe.
+SESSION = requests.Session()
+SESSION.headers.update({'Content-type': 'application/json'})
+RETRY_POLICY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=[429, 500, 502, 503, 504],
+    allowed_methods=["POST"],
+)
+SESSION.mount("https://", HTTPAdapter(pool_connections=MAX_WORKERS, pool_maxsize=MAX_WORKERS, max_retries=RETRY_POLICY))
+
+# Lookup tables are read-only module constants, built once at import
+SERIES_MAP = MappingProxyType({
     "LNS14000000": "Unemployment_Rate_SA",
     "CES0000000001": "Total_Nonfarm_Employment_SA",
     "CES0500000003": "Avg_Weekly_Hours_Private_SA",
@@ -20,7 +50,11 @@ SERIES_MAP = {
     "CUUR0000SA0L1E": "CPI_U_Ex_Food_Energy_U",
     "EIUIR": "Imports_All_Commodities_U",
     "EIUIQ": "Exports_All_Commodities_U",
-}
+})
+SERIES_IDS = tuple(SERIES_MAP)
+
+# Quarterly data is mapped to the last month of the quarter
+QUARTER_END_MONTHS = MappingProxyType({'Q01': 3, 'Q02': 6, 'Q03': 9, 'Q04': 12})
 
 # Define the data ranges
 FULL_HISTORY_YEARS = 5
@@ -29,12 +63,17 @@ UPDATE_WINDOW_YEARS = 3
 # Global variables for initial history
 END_YEAR = datetime.now().year
 START_YEAR = END_YEAR - FULL_HISTORY_YEARS
-DATA_FILE_PATH = "data/bls_data.csv"
+DATA_FILE_PATH = "data/bls_data.parquet"
+LEGACY_CSV_PATH = "data/bls_data.csv"
+
+# Columns derived from the raw series, stored alongside them so the dashboard doesn't recompute them per rerun
+CPI_COLUMN = "CPI_U_Ex_Food_Energy_U"
+CPI_YOY_COLUMN = "CPI_YoY_Change"
+TRADE_BALANCE_COLUMN = "Trade_Balance"
 
 # --- BLS API Fetch Function ---
-def get_bls_data(series_ids, start_year, end_year):
-    """Fetches data from the BLS API for the given series and date range."""
-    headers = {'Content-type': 'application/json'}
+def fetch_series_chunk(series_ids, start_year, end_year):
+    """Fetches one chunk of series from the BLS API over the shared session."""
     data = {
         "seriesid": series_ids,
         "startyear": str(start_year),
@@ -46,67 +85,197 @@ def get_bls_data(series_ids, start_year, end_year):
     }
 
     try:
-        response = requests.post(BLS_API_URL, headers=headers, json=data)
+        response = SESSION.post(BLS_API_URL, json=data)
         response.raise_for_status()
-        json_data = response.json()
+        # orjson parses the raw bytes directly, skipping requests' text decode and the stdlib json parser
+        json_data = orjson.loads(response.content)
 
-        if json_data.get('status', '').strip() == 'REQUEST_SUCCEEDED':
-            return json_data['Results']['series']
-        else:
+        if json_data.get('status', '').strip() != 'REQUEST_SUCCEEDED':
             print(f"BLS API Error: {json_data.get('message', 'Unknown Error')}. Status: {json_data.get('status')}")
             return None
-    except requests.exceptions.RequestException as e:
+
+        # Validate the shape in one pass here, so process_data can index the payload without per-item guards
+        series_results = (json_data.get('Results') or {}).get('series')
+        if not isinstance(series_results, list) or not all(
+            isinstance(series, dict) and 'seriesID' in series and isinstance(series.get('data'), list)
+            for series in series_results
+        ):
+            print("BLS API Error: response is missing the Results.series list or a series' data.")
+            return None
+
+        missing = set(series_ids) - {series['seriesID'] for series in series_results}
+        if missing:
+            print(f"BLS API Error: no data returned for series {', '.join(sorted(missing))}.")
+            return None
+        return series_results
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"An error occurred during API request: {e}")
         return None
 
+def cache_path(series_ids, start_year, end_year):
+    """Returns the response cache file for these request parameters."""
+    key = orjson.dumps({'seriesid': list(series_ids), 'startyear': start_year, 'endyear': end_year})
+    return os.path.join(CACHE_DIR, f"{hashlib.sha256(key).hexdigest()}.json")
+
+def get_bls_data(series_ids, start_year, end_year):
+    """Returns BLS data for the given series and date range, from the disk cache while it is fresh."""
+    path = cache_path(series_ids, start_year, end_year)
+    if os.path.exists(path) and time.time() - os.path.getmtime(path) < CACHE_TTL_SECONDS:
+        try:
+            with open(path, 'rb') as f:
+                series_data = orjson.loads(f.read())
+            print(f"Using cached BLS response for {start_year}-{end_year} ({path}).")
+            return series_data
+        except (OSError, orjson.JSONDecodeError) as e:
+            # An unreadable or truncated cache file is a miss; the fetch below overwrites it
+            print(f"WARNING: Ignoring unreadable BLS cache file {path} ({e}).")
+
+    series_data = fetch_bls_data(series_ids, start_year, end_year)
+
+    # Failed fetches are not cached, so the next run retries the API
+    if series_data:
+        # Write to a temp file and rename it into place, so an interrupted write never leaves a partial cache file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(orjson.dumps(series_data))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # The cache is only an optimization; a failed write must not lose the data just fetched
+            print(f"WARNING: Could not write BLS cache file {path} ({e}).")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    return series_data
+
+def fetch_bls_data(series_ids, start_year, end_year):
+    """Fetches data from the BLS API for the given series and date range, batching every series into each request."""
+    chunks = [series_ids[i:i + SERIES_PER_REQUEST] for i in range(0, len(series_ids), SERIES_PER_REQUEST)]
+    windows = [
+        (year, min(year + MAX_YEARS_PER_REQUEST - 1, end_year))
+        for year in range(start_year, end_year + 1, MAX_YEARS_PER_REQUEST)
+    ]
+    requests_to_send = [(chunk, window) for chunk in chunks for window in windows]
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(lambda request: fetch_series_chunk(request[0], *request[1]), requests_to_send))
+
+    # A partial result would save a frame with missing columns, so any failed request fails the whole fetch
+    if any(result is None for result in results):
+        return None
+
+    # Merge each series' year windows; executor.map keeps request order, so the series stay in SERIES_MAP order
+    merged = {}
+    for result in results:
+        for series in result:
+            merged.setdefault(series['seriesID'], []).extend(series['data'])
+    return [{'seriesID': series_id, 'data': data} for series_id, data in merged.items()]
+
 # --- Data Processing ---
 def process_data(series_results):
-    processed_data = {}
+    """Pivots the BLS series results into one row per Date and one column per series."""
+    # Only series in SERIES_MAP become columns; anything else the API returns is skipped whole
+    series_ids = list(dict.fromkeys(
+        series['seriesID'] for series in series_results if series['seriesID'] in SERIES_MAP
+    ))
+    col_positions = {series_id: i for i, series_id in enumerate(series_ids)}
+    years, months, cols, vals = [], [], [], []
 
     for series in series_results:
-        series_id = series['seriesID']
-        column_name = SERIES_MAP.get(series_id, series_id)
+        col = col_positions.get(series['seriesID'])
+        if col is None:
+            continue
 
         for item in series['data']:
-            year = item['year']
             period = item['period']
-            value = item['value']
 
-            date_str = None
             if period.startswith('M'):
                 month = int(period[1:])
-                date_str = f"{year}-{month:02d}-01"
-            elif period.startswith('Q'):
-                # Map quarterly data to the last month of the quarter
-                quarter_map = {'Q01': 3, 'Q02': 6, 'Q03': 9, 'Q04': 12}
-                month = quarter_map.get(period, None)
-                if month is not None:
-                    date_str = f"{year}-{month:02d}-01"
-
-            if date_str:
-                if date_str not in processed_data:
-                    processed_data[date_str] = {}
-
-                try:
-                    processed_data[date_str][column_name] = float(value)
-                except ValueError:
-                    processed_data[date_str][column_name] = None
-
-    df = pd.DataFrame.from_dict(processed_data, orient='index')
-    df.index.name = 'Date'
-    df = df.reset_index()
-    df['Date'] = pd.to_datetime(df['Date'])
-
-    df = df.sort_values(by='Date').reset_index(drop=True)
+                # M13 is the annual average; it has no month row and would land on the next January
+                if month > 12:
+                    continue
+            else:
+                month = QUARTER_END_MONTHS.get(period)
+                if month is None:
+                    continue
+
+            years.append(int(item['year']))
+            months.append(month)
+            cols.append(col)
+            vals.append(item['value'])
+
+    column_names = [SERIES_MAP[series_id] for series_id in series_ids]
+
+    # Every series came back without observations; there is no grid to build, so return the empty frame
+    if not years:
+        df = pd.DataFrame({'Date': pd.DatetimeIndex([]), **{name: pd.Series(dtype=np.float64) for name in column_names}})
+        return add_derived_columns(df)
+
+    years = np.array(years, dtype=np.int32)
+    months = np.array(months, dtype=np.int32)
+    cols = np.array(cols, dtype=np.intp)
+    # Parse the values in one vectorized call; BLS placeholders like '-' become NaN
+    vals = pd.to_numeric(pd.Series(vals, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+
+    # Map each (year, month) to a row of a dense monthly grid and scatter the values straight into
+    # the output matrix, instead of building a long frame and hashing it through pivot
+    first_year = years.min()
+    rows = (years - first_year) * 12 + months - 1
+    n_rows = rows.max() + 1
+    out = np.full((n_rows, len(series_ids)), np.nan)
+    out[rows, cols] = vals
+
+    # Keep only the months some series reported (a '-' placeholder still counts, as it did with pivot)
+    present = np.zeros(n_rows, dtype=bool)
+    present[rows] = True
+    dates = pd.date_range(start=f"{first_year}-01-01", periods=n_rows, freq='MS')[present]
+
+    # Columns stay in response order
+    df = pd.DataFrame(out[present], columns=column_names)
+    df.insert(0, 'Date', dates)
+    return add_derived_columns(df)
+
+def add_derived_columns(df):
+    """Adds the CPI year-over-year change and the trade balance, computed over the full sorted history."""
+    # fill_method=None keeps months with missing CPI as NaN; pandas 2.x would otherwise pad them with stale values
+    df[CPI_YOY_COLUMN] = df[CPI_COLUMN].pct_change(periods=12, fill_method=None) * 100
+    df[TRADE_BALANCE_COLUMN] = df['Exports_All_Commodities_U'] - df['Imports_All_Commodities_U']
     return df
 
+# --- Storage ---
+def save_data(df, path=DATA_FILE_PATH):
+    """Saves the processed data as Parquet (columnar, native datetime64 Date column)."""
+    # Dashboard values don't need float64 precision and monthly dates have no sub-day part, so store
+    # float32 and millisecond dates (the coarsest unit Parquet stores) to halve the bytes every read touches
+    value_columns = df.columns.drop('Date')
+    df = df.astype({**dict.fromkeys(value_columns, 'float32'), 'Date': 'datetime64[ms]'})
+    df.to_parquet(path, engine="pyarrow", compression="zstd", index=False)
+
+def migrate_legacy_csv():
+    """One-time conversion of the old CSV data file to Parquet, if only the CSV exists."""
+    if os.path.exists(DATA_FILE_PATH) or not os.path.exists(LEGACY_CSV_PATH):
+        return False
+
+    print(f"Migrating legacy data file {LEGACY_CSV_PATH} to {DATA_FILE_PATH}...")
+    try:
+        df_legacy = pd.read_csv(LEGACY_CSV_PATH, parse_dates=['Date'])
+    except ValueError as e:
+        # A corrupted CSV (e.g. missing the 'Date' header) is not worth migrating; the initial collection rebuilds it.
+        print(f"WARNING: Legacy CSV could not be read ({e}). Skipping migration.")
+        return False
+
+    save_data(add_derived_columns(df_legacy.sort_values(by='Date').reset_index(drop=True)))
+    print(f"Migrated {len(df_legacy)} records to {DATA_FILE_PATH}")
+    return True
+
 # 1. Initial Data Collection (Generates the full file from scratch)
 def initial_data_collection():
-    """Fetches full history (5 years) and saves the initial CSV."""
+    """Fetches full history (5 years) and saves the initial Parquet file."""
     print(f"Starting initial data collection from {START_YEAR} to {END_YEAR}...")
 
-    series_ids = list(SERIES_MAP.keys())
-    series_data = get_bls_data(series_ids, START_YEAR, END_YEAR)
+    series_data = get_bls_data(SERIES_IDS, START_YEAR, END_YEAR)
 
     if series_data:
         df_final = process_data(series_data)
@@ -114,7 +283,7 @@ def initial_data_collection():
         # Ensure data directory exists before saving
         os.makedirs(os.path.dirname(DATA_FILE_PATH), exist_ok=True)
 
-        df_final.to_csv(DATA_FILE_PATH, index=False)
+        save_data(df_final)
         print(f"Successfully collected {len(df_final)} historical records and saved to {DATA_FILE_PATH}")
         return True # Indicate success
     else:
@@ -123,7 +292,10 @@ def initial_data_collection():
 
 # 2. Universal Data Update/Creation Logic
 def update_data_and_save():
-    
+
+    # 0. Convert an existing CSV data file from before the Parquet switch
+    migrate_legacy_csv()
+
     # 1. Check for missing/empty/corrupt file (Handles the 'ValueError: Missing column' error)
     if not os.path.exists(DATA_FILE_PATH) or os.path.getsize(DATA_FILE_PATH) == 0:
         print("Initial run check: Data file does not exist or is empty. Attempting full historical collection.")
@@ -138,18 +310,18 @@ def update_data_and_save():
 
     # 2. File exists and should have content. Read the existing data.
     try:
-        # This is line 149, which has been consistently failing.
-        df_existing = pd.read_csv(DATA_FILE_PATH, parse_dates=['Date'])
-    
+        df_existing = pd.read_parquet(DATA_FILE_PATH, engine="pyarrow")
+        if 'Date' not in df_existing.columns:
+            raise ValueError("Missing 'Date' column")
+
     except ValueError as e:
-        # Handle the case where the file exists but is corrupted (i.e., missing the 'Date' header)
-        if "Missing column provided to 'parse_dates'" in str(e):
-            print("WARNING: Existing CSV file structure error (corrupted header). Deleting and running initial collection to rebuild.")
-            os.remove(DATA_FILE_PATH)
-            # Recursively call the function. It will now hit the 'if not os.path.exists' block above.
-            update_data_and_save()
-            return
-        raise # Re-raise other unexpected ValueErrors
+        # Handle the case where the file exists but is corrupted (unreadable or missing the 'Date' column).
+        # pyarrow's ArrowInvalid is a ValueError subclass, so both cases land here.
+        print(f"WARNING: Existing data file structure error ({e}). Deleting and running initial collection to rebuild.")
+        os.remove(DATA_FILE_PATH)
+        # Recursively call the function. It will now hit the 'if not os.path.exists' block above.
+        update_data_and_save()
+        return
 
     # 3. Define update window years (CRITICAL: Needs to be defined here for the update path)
     current_year = datetime.now().year
@@ -161,8 +333,7 @@ def update_data_and_save():
     print(f"Fetching data for update/revisions from {update_start_year} to {update_end_year}...")
 
     # 4. Fetch update data
-    series_ids = list(SERIES_MAP.keys())
-    series_data = get_bls_data(series_ids, update_start_year, update_end_year)
+    series_data = get_bls_data(SERIES_IDS, update_start_year, update_end_year)
 
     if not series_data:
         print("Monthly update data collection failed.")
@@ -170,8 +341,14 @@ def update_data_and_save():
 
     # 5. Process, combine, and save
     df_new = process_data(series_data)
-    df_combined = pd.concat([df_existing, df_new]).drop_duplicates(subset=['Date'], keep='last')
-    df_combined = df_combined.sort_values(by='Date').reset_index(drop=True)
+    # Align both frames on Date: rows in the update window take the new (revised) values, and
+    # combine_first's index union comes back sorted, so no duplicate scan or re-sort is needed
+    df_combined = df_new.set_index('Date').combine_first(df_existing.set_index('Date'))
+    # combine_first also sorts the columns; restore the stored order with any new series at the end
+    column_order = list(dict.fromkeys([*df_existing.columns, *df_new.columns]))
+    df_combined = df_combined.reset_index()[column_order]
+    # The update window starts mid-history, so its first 12 YoY values are NaN; recompute over the combined frame
+    df_combined = add_derived_columns(df_combined)
 
     new_records_count = len(df_combined) - len(df_existing)
     if new_records_count > 0:
@@ -179,7 +356,7 @@ def update_data_and_save():
     else:
         print("No new records found, assuming data was already up to date or revisions were applied.")
 
-    df_combined.to_csv(DATA_FILE_PATH, index=False)
+    save_data(df_combined)
     print(f"Data updated successfully. Total records now: {len(df_combined)}")
 
 